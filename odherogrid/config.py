@@ -3,13 +3,14 @@ This module implements functionality related to generating, maintaining
 and updating a persistent user configuration file for ODHeroGrid. 
 """
 
+import os
+import re
 import sys
-from copy import deepcopy
-from pathlib import Path
-from typing import List, Union
+import time
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Tuple, Union
 
 import click
-import yaml
 
 from .cli.parse import parse_arg_brackets
 from .cli.utils import progress
@@ -18,22 +19,168 @@ from .herogrid import detect_userdata_path
 from .settings import DEFAULT_GRID_NAME, CONFIG
 from .error import handle_exception
 
+# PyYAML is only needed when config.yml is read or written,
+# so it is imported on first use (see `_get_yaml()`)
+_yaml = None
+_YamlLoader = None
+_YamlDumper = None
+
+# Parsed configs keyed by path, along with the (inode, mtime, size) of the file
+# they were parsed from. Lets repeated loads of an unchanged file skip YAML.
+_CONFIG_CACHE: Dict[Path, Tuple[Tuple[int, int, int], dict]] = {}
+
+# Files modified less than this long before being parsed are not cached.
+# An in-place edit within the same timestamp tick would keep the inode, size
+# and mtime, so the stale entry could not be detected (FAT has a 2s resolution).
+_MTIME_TICK_NS = 2_000_000_000
+
+
+def _new_config_base() -> dict:
+    """Returns a new config with default values.
+    Use this instead of copying `CONFIG_BASE`."""
+    return {
+        "path": None,
+        "brackets": [Bracket.DEFAULT.value],
+        "layout": Layout.DEFAULT.value,
+        "config_name": DEFAULT_GRID_NAME,
+        "ascending": False,
+    }
+
+
+CONFIG_BASE = _new_config_base()
+_CONFIG_KEYS = frozenset(CONFIG_BASE)
+
+# Location of hero_grid_config.json relative to a Steam userdata directory
+_HERO_GRID_REL = PurePosixPath("570/remote/cfg/hero_grid_config.json")
+
+# Enum prompt values. The enums are static, so these are computed once.
+_BRACKET_START, _BRACKET_END = enum_start_end(Bracket)
+_BRACKET_STRING = enum_string(Bracket)
+_LAYOUT_START, _LAYOUT_END = enum_start_end(Layout)
+_LAYOUT_STRING = enum_string(Layout)
+_LAYOUT_CHOICE = click.Choice([str(layout.value) for layout in Layout])
+
+
+def _get_yaml():
+    """Imports PyYAML and selects a loader/dumper on first call."""
+    global _yaml, _YamlLoader, _YamlDumper
+    if _yaml is None:
+        import yaml
+        # Use the libyaml-backed loader/dumper when PyYAML was built with it.
+        # The base loader leaves all scalars as strings (no implicit type
+        # resolution), and `_coerce_config()` converts them instead.
+        # Only unquoted nulls are still resolved, so that a quoted 'null'
+        # written by the dumper loads back as a string.
+        class _ConfigLoader(getattr(yaml, "CBaseLoader", yaml.BaseLoader)):
+            pass
+        _ConfigLoader.add_implicit_resolver(
+            "tag:yaml.org,2002:null", 
+            re.compile(r"^(?:~|null|Null|NULL|)$"), 
+            ["~", "n", "N", ""]
+        )
+        _ConfigLoader.add_constructor("tag:yaml.org,2002:null", lambda loader, node: None)
+        _YamlLoader = _ConfigLoader
+        _YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+        _yaml = yaml
+    return _yaml
+
+
+def _stat_key(path: Path) -> Tuple[int, int, int]:
+    # The inode only changes for writers that replace the file (such as
+    # update_config()). In-place edits are detected by mtime and size only.
+    st = path.stat()
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _copy_config(config: dict) -> dict:
+    """Returns a copy of config that does not share its brackets list."""
+    config = config.copy()
+    if isinstance(config.get("brackets"), list):
+        config["brackets"] = list(config["brackets"])
+    return config
+
 
-CONFIG_BASE = {
-    "path": None,
-    "brackets": [Bracket.DEFAULT.value],
-    "layout": Layout.DEFAULT.value,
-    "config_name": DEFAULT_GRID_NAME,
-    "ascending": False,
+def _parse_str(value: str) -> str:
+    if not isinstance(value, str):
+        raise TypeError("value must be a string")
+    return value
+
+
+def _parse_optional_str(value: Optional[str]) -> Optional[str]:
+    return None if value is None else _parse_str(value)
+
+
+def _parse_bool(value: str) -> bool:
+    value = _parse_str(value).lower()
+    if value in ("true", "yes", "on"):
+        return True
+    elif value in ("false", "no", "off"):
+        return False
+    raise ValueError(f"'{value}' is not a boolean value")
+
+
+def _parse_int_list(value: list) -> List[int]:
+    if not isinstance(value, list):
+        raise TypeError("value must be a list")
+    return [int(v) for v in value]
+
+
+# Converts values produced by the YAML loader (strings, lists and None)
+# to their config types
+_COERCERS = {
+    "path": _parse_optional_str,
+    "brackets": _parse_int_list,
+    "layout": int,
+    "config_name": _parse_str,
+    "ascending": _parse_bool,
 }
 
 
+def _coerce_config(config: dict) -> Tuple[dict, List[str]]:
+    """Returns a copy of config with values converted to their config types,
+    along with a list of keys whose values could not be converted.
+    
+    Unknown keys and invalid values are left out, 
+    the latter are then filled in by `check_config_integrity()`.
+    """
+    coerced = {}
+    invalid = []
+    for key, value in config.items():
+        coerce = _COERCERS.get(key)
+        if not coerce:
+            continue
+        try:
+            coerced[key] = coerce(value)
+        except (TypeError, ValueError):
+            invalid.append(key)
+    return coerced, invalid
+
+
 def _do_load_config(*, filename: Union[str, Path]=None) -> dict:
     """Loads configuration file and returns it as a dict."""
-    path = filename or CONFIG
-    with open(path, "r") as f:
-        config = yaml.load(f.read(), Loader=yaml.loader.FullLoader)
-    if not config:
+    path = Path(filename or CONFIG)
+    key = _stat_key(path)
+    cached = _CONFIG_CACHE.get(path)
+    if cached and cached[0] == key:
+        return _copy_config(cached[1]) # callers can't modify the cache
+
+    yaml = _get_yaml()
+    with open(path, "rb") as f:
+        config = yaml.load(f, Loader=_YamlLoader)
+    if isinstance(config, dict):
+        config, invalid = _coerce_config(config)
+    else:
+        config, invalid = None, [] # not a mapping, treat as damaged
+    if invalid:
+        click.echo(
+            f"'{path.name}' has invalid values for the following keys: "
+            f"{', '.join(invalid)}. They will be treated as missing."
+        )
+    if config:
+        # Configs with invalid values are not cached, so they are reported on every load
+        if not invalid and time.time_ns() - key[1] > _MTIME_TICK_NS: # see _MTIME_TICK_NS
+            _CONFIG_CACHE[path] = (key, _copy_config(config))
+    else:
         if click.confirm(
             "Config is empty or damaged! "
             "Do you want to attempt to repair it?"
@@ -67,11 +214,11 @@ def load_config() -> dict:
 
 
 def create_config(config: dict, *, filename: Union[str, Path]=None) -> None:
-    """Creates a config file and its parent directories (if needed)"""
-    path = Path((filename or CONFIG))
+    """Creates the config file's parent directories (if needed).
+    The file itself is created when the config is written."""
+    path = CONFIG if filename is None else Path(filename)
     try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.touch()
+        path.parent.mkdir(parents=True, exist_ok=True) # no-op if it already exists
     except Exception as e:  # We are mainly concerned with OSError and its
         handle_exception(e) # subclasses, but we might as well log all errors here.
         
@@ -79,25 +226,50 @@ def create_config(config: dict, *, filename: Union[str, Path]=None) -> None:
 
 def update_config(config: dict, *, filename: Union[str, Path]=None) -> None:
     """Saves config as a YAML-formatted file."""
-    path = Path((filename or CONFIG)) # make sure we have a path object
-    if not path.exists():
-        create_config(config, filename=filename)
-    with open(path, "w") as f:
-        f.write(yaml.dump(config, default_flow_style=False))    
+    yaml = _get_yaml()
+    path = CONFIG if filename is None else Path(filename) # CONFIG is already a Path
+    create_config(config, filename=path)
+    
+    # Write to a temporary file first, then replace the config with it, 
+    # so an interrupted write can never leave a partially written config.
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            yaml.dump(
+                config, f, 
+                Dumper=_YamlDumper, 
+                default_flow_style=False, 
+                sort_keys=False, 
+                encoding="utf-8"
+            )
+        os.replace(tmp, path)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    # Values are only coerced to their config types when loaded,
+    # so the next load has to parse the file again
+    _CONFIG_CACHE.pop(path, None)
 
 
 def check_config_integrity(config: dict, *, filename: Union[str, Path]=None) -> dict:
     """Removes unknown keys and inserts missing keys."""
+    if config is None: # empty config file
+        config = {}
+    
+    config_keys = config.keys()
+    if config_keys == _CONFIG_KEYS: # nothing to fix
+        return config
+
     # Remove unknown keys
-    c = deepcopy(config) # config copy so we can modify while iterating
-    for key in config:
-        if key not in CONFIG_BASE:
-            c.pop(key)
-    config = c
+    for key in config_keys - _CONFIG_KEYS: # set difference, safe to pop
+        config.pop(key)
 
     # Check for missing keys
-    missing_keys = [(k, v) for (k, v) in CONFIG_BASE.items() if k not in config]
-    if missing_keys:
+    missing = _CONFIG_KEYS - config_keys
+    if missing:
+        defaults = _new_config_base()
+        missing_keys = [(k, v) for (k, v) in defaults.items() if k in missing] # keep order
         _fix_missing_keys(config, missing_keys)
         update_config(config, filename=filename)
     
@@ -105,15 +277,7 @@ def check_config_integrity(config: dict, *, filename: Union[str, Path]=None) ->
 
 
 def _fix_missing_keys(config: dict, missing_keys: list) -> dict:
-    CONFIG_FUNCS = {
-        "path": setup_hero_grid_config_path,
-        "brackets": setup_bracket,
-        "layout": setup_layout,
-        "config_name": setup_config_name,
-        "ascending": setup_winrate_sorting
-    }
-
-    missing = ", ".join([key for (key, value) in missing_keys])
+    missing = ", ".join(key for (key, value) in missing_keys)
     click.echo(f"'config.yml' is missing the following keys: {missing}")
 
     # Replace missing keys in user's config
@@ -123,7 +287,7 @@ def _fix_missing_keys(config: dict, missing_keys: list) -> dict:
         if click.confirm(
             f"Do you want add a value for the missing key '{key}'?"
         ):
-            func = CONFIG_FUNCS.get(key)
+            func = _CONFIG_FUNCS.get(key)
             if not func:
                 raise KeyError(
                     f"No function exists to fill config entry '{key}'! "
@@ -177,7 +341,8 @@ def setup_hero_grid_config_path(config: dict) -> dict:
         click.echo(e.args[0])
         cfg_path = ask_steam_userdata_path()
     else:
-        directories = [d for d in p.iterdir()]
+        with os.scandir(p) as it:
+            directories = [d for d in it if d.is_dir()]
         
         # Ask user for a path if no directories found in auto-detected path
         if not directories:
@@ -189,37 +354,33 @@ def setup_hero_grid_config_path(config: dict) -> dict:
             subdirs = {idx+1: d for idx, d in enumerate(directories)}
             
             # Let user select a directory
-            _choices = "\n".join(f"\t{idx}. {d.stem}" for idx, d in subdirs.items())
+            _choices = "\n".join(f"\t{idx}. {d.name}" for idx, d in subdirs.items())
             click.echo(_choices)
             
             choice = 0
             while choice not in subdirs:
                 choice = click.prompt(f"Select directory (1-{len(directories)})", type=int) 
-            cfg_path = subdirs.get(choice)
+            cfg_path = subdirs.get(choice).path
     finally:    
-        config["path"] = str((cfg_path / "570/remote/cfg/hero_grid_config.json"))
+        config["path"] = str(Path(cfg_path) / _HERO_GRID_REL)
     
     return config
 
 
 def setup_bracket(config: dict) -> dict:
-    # Determine lowest and highest Bracket enum value
-    brackets_start, brackets_end = enum_start_end(Bracket)
-
     # Prompt user to select a default bracket
-    available_brackets = enum_string(Bracket)
-    click.echo(f"Bracket:\n{available_brackets}")
+    click.echo(f"Bracket:\n{_BRACKET_STRING}")
 
     brackets = _get_brackets(
         "Specify default skill bracket(s), separated by spaces", 
-        brackets_start, 
-        brackets_end
+        _BRACKET_START, 
+        _BRACKET_END
     )
     while not brackets:
         brackets = _get_brackets(
             "No valid brackets provided. Try again", 
-            brackets_start, 
-            brackets_end
+            _BRACKET_START, 
+            _BRACKET_END
         )
 
     config["brackets"] = brackets
@@ -239,24 +400,18 @@ def _get_brackets(msg: str, brackets_start: int, brackets_end: int) -> List[int]
 
 def setup_layout(config: dict) -> dict:
     # Prompt user to select a default layout
-    available_layout = enum_string(Layout)
-    click.echo(f"Layout:\n{available_layout}")
-
-    # Determine lowest and highest Layout enum value
-    layout_start, layout_end = enum_start_end(Layout)
-    g_range = list(range(layout_start, layout_end+1))
+    click.echo(f"Layout:\n{_LAYOUT_STRING}")
     
-    get_grp = lambda m: click.prompt(
-        f"{m} ({layout_start}-{layout_end})",
-        type=int,
-        default=Layout.DEFAULT.value,
-        show_default=False
-    )  
-    layout = get_grp("Select default hero layout") 
-    while layout not in g_range:
-        layout = get_grp("Invalid layout. Try again")
+    # click re-prompts until a valid choice is given
+    layout = click.prompt(
+        f"Select default hero layout ({_LAYOUT_START}-{_LAYOUT_END})",
+        type=_LAYOUT_CHOICE,
+        default=str(Layout.DEFAULT.value),
+        show_default=False,
+        show_choices=False
+    )
     
-    config["layout"] = layout
+    config["layout"] = int(layout)
 
     return config
 
@@ -303,7 +458,7 @@ def run_first_time_setup() -> dict:
 
 
 def _do_run_first_time_setup() -> dict:
-    config = deepcopy(CONFIG_BASE)
+    config = _new_config_base()
 
     # Setup config parameters
     functions = [
@@ -326,3 +481,14 @@ def _do_run_first_time_setup() -> dict:
     update_config(config)
 
     return config
+
+
+# Setup functions used to fill in missing config keys.
+# Defined here, after all setup functions.
+_CONFIG_FUNCS = {
+    "path": setup_hero_grid_config_path,
+    "brackets": setup_bracket,
+    "layout": setup_layout,
+    "config_name": setup_config_name,
+    "ascending": setup_winrate_sorting
+}
@@ -1,3 +1,4 @@
+import functools
 from enum import IntEnum
 from typing import Tuple
 
@@ -35,6 +36,7 @@ def enum_start_end(enum: IntEnum) -> Tuple[int, int]:
     return e_start, e_end   
 
 
+@functools.lru_cache(maxsize=None)
 def enum_string(enum: IntEnum) -> str:
     choices = "\n".join(
         f"\t{e.value}. {e.name.capitalize()}" 
@@ -1,4 +1,3 @@
-import copy
 import json
 import sys
 from datetime import datetime
@@ -9,7 +8,7 @@ import click
 
 from .enums import Bracket, Layout
 from .resources import (HERO_GRID_CONFIG_BASE, HERO_GRID_BASE, _get_new_category,
-                        get_new_hero_grid_base)
+                        get_new_hero_grid_base, get_new_hero_grid_config)
 
 
 class HeroGrid:
@@ -235,7 +234,7 @@ class HeroGridConfig:
                 name = f"hero_grid_config_INVALID_{datetime.now().isoformat()}.json"
                 p.rename(p.stem / name)
                 click.echo(f"The existing config was renamed to '{name}'")
-                hero_grid_config = copy.deepcopy(HERO_GRID_CONFIG_BASE)
+                hero_grid_config = get_new_hero_grid_config()
             finally:
                 return hero_grid_config
 
@@ -1,76 +1,37 @@
-from copy import deepcopy
-
 from .settings import DEFAULT_GRID_NAME
 
 
-CATEGORY_BASE = {
-    "category_name": "name",
-    "x_position": 0.000000,
-    "y_position": 0.000000,
-    "width": 1180.0,
-    "height": 180.0,
-    "hero_ids": [],
-}
-
-
-HERO_GRID_BASE = {
-    "config_name": DEFAULT_GRID_NAME,
-    "categories": [
-        {
-            "category_name": "Strength",
-            "x_position": 0.000000,
-            "y_position": 0.000000,
-            "width": 1180.0,
-            "height": 180.0,
-            "hero_ids": [],
-        },
-        {
-            "category_name": "Agility",
-            "x_position": 0.000000,
-            "y_position": 200.000000,
-            "width": 1180.0,
-            "height": 180.0,
-            "hero_ids": [],
-        },
-        {
-            "category_name": "Intelligence",
-            "x_position": 0.000000,
-            "y_position": 400.000000,
-            "width": 1180.0,
-            "height": 180.0,
-            "hero_ids": [],
-        }
-    ]
-}
-
+# Name and y-position of each category in the default (main stat) hero grid
+_MAINSTAT_CATEGORIES = (
+    ("Strength", 0.0),
+    ("Agility", 200.0),
+    ("Intelligence", 400.0),
+)
 
-# Represents default hero_grid_config.json
-HERO_GRID_CONFIG_BASE = {
-    "version": 3,
-    "configs": [],
-}
 
 def _get_new_category(name: str, x_pos: float=0.0, y_pos: float=0.0, width: float=0.0, height: float=0.0) -> dict:
-    # Copy category and give it a name
-    category = deepcopy(CATEGORY_BASE)
-    category["category_name"] = name
-
-    params = {
-        "x_position": x_pos,
-        "y_position": y_pos,
-        "width": width,
-        "height": height
+    # Falsy (zero) values fall back on the default category dimensions
+    return {
+        "category_name": name,
+        "x_position": float(abs(x_pos)) or 0.0, # ensure values are positive floats
+        "y_position": float(abs(y_pos)) or 0.0,
+        "width": float(abs(width)) or 1180.0,
+        "height": float(abs(height)) or 180.0,
+        "hero_ids": [],
     }
-    for param, value in params.items():
-        value = float(abs(value)) # ensure value is a positive float
-        if value:
-            category[param] = value
-
-    return category
 
 
 def get_new_hero_grid_base() -> dict:
-    return deepcopy(HERO_GRID_BASE)
+    """
+    Returns a new dict with contents equivalent to `HERO_GRID_BASE`
+    """
+    return {
+        "config_name": DEFAULT_GRID_NAME,
+        "categories": [
+            _get_new_category(name, y_pos=y_pos)
+            for name, y_pos in _MAINSTAT_CATEGORIES
+        ]
+    }
 
 
 def get_new_hero_grid_config() -> dict:
@@ -78,4 +39,14 @@ def get_new_hero_grid_config() -> dict:
     Returns a dict with contents equivalent to an empty
     hero_grid_config.json
     """
-    return deepcopy(HERO_GRID_CONFIG_BASE)
\ No newline at end of file
+    return {
+        "version": 3,
+        "configs": [],
+    }
+
+
+HERO_GRID_BASE = get_new_hero_grid_base()
+
+
+# Represents default hero_grid_config.json
+HERO_GRID_CONFIG_BASE = get_new_hero_grid_config()
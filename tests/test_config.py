@@ -1,9 +1,10 @@
+import os
 from io import StringIO
 
 import pytest
 
-from odherogrid.config import (CONFIG_BASE, _do_load_config,
-                               check_config_integrity, update_config)
+from odherogrid.config import (CONFIG_BASE, _CONFIG_CACHE, _do_load_config,
+                               _get_yaml, check_config_integrity, update_config)
 
 
 # config.py
@@ -53,3 +54,125 @@ def test_check_config_integrity_userdefined(monkeypatch, config_empty, testconf)
         conf = check_config_integrity(conf, filename=testconf)
         
         assert conf.keys() == CONFIG_BASE.keys()
+
+
+def test__do_load_config_cache(tmp_path, testconf_dict):
+    """Tests that cached configs are returned as copies and are invalidated
+    when the file changes."""
+    path = tmp_path / "config.yml"
+    update_config(testconf_dict, filename=path)
+    # Recently modified files are not cached
+    mtime = path.stat().st_mtime_ns - 60_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+    
+    c = _do_load_config(filename=path)
+    assert path in _CONFIG_CACHE
+    c["config_name"] = "modified"
+    c["brackets"].append(99)
+    assert _do_load_config(filename=path) == testconf_dict
+
+    # Modify file on disk (same size, same inode)
+    path.write_text(path.read_text().replace("layout: 1", "layout: 2"))
+    assert _do_load_config(filename=path)["layout"] == 2
+
+
+def test__do_load_config_cache_racy(tmp_path, testconf_dict):
+    """Tests that an in-place edit within the same mtime tick as the load
+    is not hidden by the cache."""
+    path = tmp_path / "config.yml"
+    update_config(testconf_dict, filename=path)
+    st = path.stat()
+    assert _do_load_config(filename=path)["layout"] == 1
+
+    # Edit in place, and restore the old mtime to simulate a coarse timestamp tick
+    path.write_text(path.read_text().replace("layout: 1", "layout: 2"))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert _do_load_config(filename=path)["layout"] == 2
+
+
+def test__do_load_config_unknown_keys(tmp_path, testconf_dict):
+    """Tests that keys not found in `CONFIG_BASE` are dropped when loading."""
+    path = tmp_path / "config.yml"
+    update_config(dict(testconf_dict, unknown_key=1), filename=path)
+    assert _do_load_config(filename=path) == testconf_dict
+    
+    _CONFIG_CACHE.clear() # parse file from disk
+    assert _do_load_config(filename=path) == testconf_dict
+
+
+def test__do_load_config_types(tmp_path):
+    """Tests that values are converted to their expected types, and that
+    values which cannot be converted are dropped."""
+    path = tmp_path / "config.yml"
+    path.write_text(
+        "path: null\n"
+        "brackets:\n- 1\n- 7\n"
+        "layout: 2\n"
+        "config_name: 123\n"
+        "ascending: notabool\n"
+    )
+    c = _do_load_config(filename=path)
+    assert c == {"path": None, "brackets": [1, 7], "layout": 2, "config_name": "123"}
+
+    # Lists and mappings where scalars are expected
+    path.write_text(
+        "path: [x]\n"
+        "brackets:\n  a: b\n"
+        "layout: 3\n"
+        "config_name: [a, b]\n"
+        "ascending: [1]\n"
+    )
+    assert _do_load_config(filename=path) == {"layout": 3}
+
+
+def test__do_load_config_after_update(tmp_path, testconf_dict):
+    """Tests that a config saved with `update_config()` loads the same
+    whether or not it has been cached."""
+    path = tmp_path / "config.yml"
+    update_config(dict(testconf_dict, layout="2", ascending=1), filename=path)
+    c = _do_load_config(filename=path)
+    
+    _CONFIG_CACHE.clear() # parse file from disk
+    assert c == _do_load_config(filename=path)
+    assert c["layout"] == 2
+    assert "ascending" not in c
+
+
+@pytest.mark.parametrize("value", ["null", "~", "", "NULL", None])
+def test__do_load_config_null_roundtrip(tmp_path, testconf_dict, value):
+    """Tests that only actual null values (not strings such as 'null')
+    are loaded as None."""
+    path = tmp_path / "config.yml"
+    update_config(dict(testconf_dict, path=value), filename=path)
+    _CONFIG_CACHE.clear() # parse file from disk
+    assert _do_load_config(filename=path)["path"] == value
+
+
+def test__do_load_config_invalid_message(tmp_path, testconf_dict, capsys):
+    """Tests that keys with invalid values are reported as such when loading."""
+    path = tmp_path / "config.yml"
+    update_config(testconf_dict, filename=path)
+    path.write_text(path.read_text().replace("layout: 1", "layout: abc"))
+    
+    c = _do_load_config(filename=path)
+    assert "layout" not in c
+    out = capsys.readouterr().out
+    assert "invalid values for the following keys: layout." in out
+
+
+def test_update_config_interrupted(monkeypatch, tmp_path, testconf_dict):
+    """Tests that a write that fails partway through leaves the existing
+    config untouched and removes the temporary file."""
+    path = tmp_path / "config.yml"
+    update_config(testconf_dict, filename=path)
+    contents = path.read_bytes()
+
+    def dump(data, stream, **kwargs):
+        stream.write(b"path: partial")
+        raise RuntimeError("interrupted")
+    monkeypatch.setattr(_get_yaml(), "dump", dump)
+
+    with pytest.raises(RuntimeError):
+        update_config(dict(testconf_dict, layout=2), filename=path)
+    assert path.read_bytes() == contents
+    assert not (tmp_path / "config.yml.tmp").exists()